@@ -0,0 +1,114 @@
+"""
+封面渲染内存基准
+
+用线程池同时为 N 张合成的 AI 底图叠加文字（不调用任何 API），报告每 100 张并发封面的
+峰值 RSS 增量。每个 MODE_IMG_MAX_INFLIGHT 取值在独立子进程中运行，互不影响峰值统计。
+依赖 resource 模块，仅支持 Linux/macOS。
+
+用法:
+    python benchmarks/bench_cover_memory.py [--covers 100] [--size 1728x2304] [--budgets 100,4,1]
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值 RSS（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_worker(covers: int, size: tuple[int, int]) -> dict:
+    """在当前进程中并发渲染 covers 张封面，返回统计结果"""
+    sys.path.insert(0, str(ROOT))
+    from PIL import Image, ImageDraw
+    from src.services.cover_generator import MAX_INFLIGHT_IMAGES, overlay_cover_text
+
+    workdir = Path(tempfile.mkdtemp(prefix="rednote-bench-"))
+    try:
+        source = workdir / "source.png"
+        with Image.new("RGB", size, (220, 200, 180)) as img:
+            draw = ImageDraw.Draw(img)
+            for i in range(0, size[0], 40):
+                draw.line([(i, 0), (size[0] - i, size[1])], fill=(i % 255, 120, 200), width=6)
+            img.save(source, "PNG")
+
+        paths = []
+        for i in range(covers):
+            path = workdir / f"P{i:04d}_cover.png"
+            shutil.copyfile(source, path)
+            paths.append(path)
+
+        baseline = peak_rss_mb()
+        product = {"name": "云朵感记忆棉枕头", "tone": "温馨治愈"}
+        title = "打工人的睡眠救星！这个枕头让我一觉到天亮"
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=covers) as pool:
+            list(pool.map(
+                lambda p: overlay_cover_text(str(p), dict(product, product_id=p.stem), title),
+                paths,
+            ))
+        elapsed = time.perf_counter() - start
+
+        return {
+            "budget": MAX_INFLIGHT_IMAGES,
+            "covers": covers,
+            "baseline_mb": baseline,
+            "peak_mb": peak_rss_mb(),
+            "seconds": elapsed,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--covers", type=int, default=100)
+    parser.add_argument("--size", default="1728x2304", help="合成底图尺寸，宽x高")
+    parser.add_argument("--budgets", default="100,4,1", help="要比较的 MODE_IMG_MAX_INFLIGHT 取值")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    size = tuple(int(v) for v in args.size.lower().split("x"))
+
+    if args.worker:
+        import contextlib
+        import io
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats = run_worker(args.covers, size)
+        print(json.dumps(stats))
+        return 0
+
+    print(f"{args.covers} 张并发封面，底图 {size[0]}x{size[1]}")
+    print(f"{'在途上限':>8}{'峰值RSS(MB)':>14}{'增量(MB)':>12}{'每100张(MB)':>14}{'耗时(s)':>10}")
+    for budget in args.budgets.split(","):
+        env = dict(os.environ, MODE_IMG_MAX_INFLIGHT=budget.strip())
+        proc = subprocess.run(
+            [sys.executable, __file__, "--worker", "--covers", str(args.covers), "--size", args.size],
+            cwd=ROOT, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(proc.stderr)
+            return 1
+        stats = json.loads(proc.stdout.strip().splitlines()[-1])
+        delta = stats["peak_mb"] - stats["baseline_mb"]
+        per_100 = delta * 100 / stats["covers"]
+        print(f"{stats['budget']:>8}{stats['peak_mb']:>14.1f}{delta:>12.1f}{per_100:>14.1f}{stats['seconds']:>10.2f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+启动耗时基准
+
+在子进程中测量 `import src.app` 与 `python main.py validate` 的耗时，并检查轻量路径
+没有加载重依赖。超出预算时以非零状态码退出，可直接放进 CI。
+
+用法:
+    python benchmarks/bench_import_time.py [--runs 5] [--budget-ms 150]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ("langgraph", "langchain_openai", "langchain_core", "PIL", "requests", "httpx")
+
+CHECK_SNIPPET = f"""
+import sys
+import src.app
+loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+print(",".join(loaded))
+"""
+
+
+def time_command(cmd: list[str], runs: int) -> float:
+    """运行命令 runs 次，返回耗时中位数（毫秒）"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=150.0, help="相对于空解释器启动的额外耗时上限")
+    args = parser.parse_args()
+
+    baseline = time_command([sys.executable, "-c", "pass"], args.runs)
+    cases = {
+        "import src.app": [sys.executable, "-c", "import src.app"],
+        "main.py validate": [sys.executable, "main.py", "validate"],
+        "main.py --help": [sys.executable, "main.py", "--help"],
+    }
+
+    print(f"{'场景':<20}{'中位数(ms)':>12}{'额外(ms)':>12}")
+    print(f"{'python -c pass':<20}{baseline:>12.1f}{0:>12.1f}")
+    failed = False
+    for name, cmd in cases.items():
+        elapsed = time_command(cmd, args.runs)
+        overhead = elapsed - baseline
+        flag = "" if overhead <= args.budget_ms else "  超出预算"
+        failed = failed or bool(flag)
+        print(f"{name:<20}{elapsed:>12.1f}{overhead:>12.1f}{flag}")
+
+    check = subprocess.run([sys.executable, "-c", CHECK_SNIPPET], cwd=ROOT, capture_output=True, text=True)
+    loaded = [m for m in check.stdout.strip().split(",") if m]
+    if check.returncode != 0:
+        print(f"\n❌ import src.app 失败:\n{check.stderr}")
+        failed = True
+    elif loaded:
+        print(f"\n❌ import src.app 加载了重依赖: {', '.join(loaded)}")
+        failed = True
+    else:
+        print("\n✅ import src.app 未加载重依赖")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,92 @@
 """
 RedNote-Agent 主程序入口
 小红书图文生成工具
+
+用法:
+    python main.py                                   # 等同于 run
+    python main.py run [--async] [--concurrency N]
+    python main.py validate [--concurrency N]        # 预检 inputs.json 并估算 token/耗时，不加载任何重依赖
+    python main.py render-only [--force]             # 为 results.json 中缺少封面的结果渲染模板封面
+    python main.py retry-failed                      # 只重跑 failures.json 中失败的阶段
+    python main.py serve [--port 8000] [--concurrency N]   # 常驻 HTTP 服务，持续接收产品批次
 """
-from dotenv import load_dotenv
-from src.app import process_products
+import argparse
+import sys
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(description="RedNote-Agent 小红书图文生成工具")
+    parser.add_argument("--input", default="inputs.json", help="产品数据文件")
+    parser.add_argument("--output", default="outputs", help="输出目录")
+    subparsers = parser.add_subparsers(dest="command")
+
+    run_parser = subparsers.add_parser("run", help="生成文案和封面（默认）")
+    run_parser.add_argument("--async", dest="use_async", action="store_true", help="使用异步工作流并发处理")
+    run_parser.add_argument("--concurrency", type=int, default=8, help="异步模式下的最大并发产品数")
+
+    validate_parser = subparsers.add_parser("validate", help="预检输入文件并估算用量")
+    validate_parser.add_argument("--concurrency", type=int, default=8, help="估算耗时所用的并发数")
+    render_parser = subparsers.add_parser("render-only", help="为缺少封面的结果渲染模板封面")
+    render_parser.add_argument("--force", action="store_true", help="重新渲染所有结果的封面，覆盖已有封面")
+    subparsers.add_parser("retry-failed", help="只重跑失败清单中失败的阶段")
+
+    serve_parser = subparsers.add_parser("serve", help="启动常驻服务，通过 HTTP 提交任务")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument("--concurrency", type=int, default=8, help="全局最大并发产品数")
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    command = args.command or "run"
+
+    if command == "validate":
+        from src.app import validate_input
+
+        plan = validate_input(args.input, concurrency=args.concurrency)
+        if plan is None or plan["errors"]:
+            return 1
+        print(f"[完成] {args.input} 校验通过")
+        return 0
+
+    if command == "render-only":
+        from src.app import render_covers
+
+        return 0 if render_covers(args.input, args.output, force=args.force) is not None else 1
+
+    from dotenv import load_dotenv
+    from src.core.planner import PreflightError
 
-if __name__ == "__main__":
     load_dotenv()
-    process_products()
+    if command == "serve":
+        from src.server import serve
+
+        serve(args.host, args.port, args.output, concurrency=args.concurrency)
+        return 0
+
+    if command == "retry-failed":
+        from src.app import retry_failed
+
+        return 0 if retry_failed(args.input, args.output) is not None else 1
+
+    try:
+        if getattr(args, "use_async", False):
+            import asyncio
+            from src.app import aprocess_products
+
+            asyncio.run(aprocess_products(args.input, args.output, concurrency=args.concurrency))
+        else:
+            from src.app import process_products
+
+            process_products(args.input, args.output)
+    except PreflightError as e:
+        print(f"[错误] {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
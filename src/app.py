@@ -1,5 +1,8 @@
 """
 产品处理主流程
+
+LangGraph、langchain_openai、Pillow、requests 等重依赖只在需要它们的阶段内导入，
+validate 等轻量命令无需加载。
 """
 import json
 import sys
@@ -13,7 +16,9 @@ if sys.platform == 'win32':
         stdout_attr(encoding='utf-8', errors='replace')
 
 from .core.state import AgentState
-from .core.agent import build_graph
+from .core.planner import PreflightError, format_plan, plan_batch
+
+FAILURES_FILE = "failures.json"
 
 
 def load_products(file_path: str = "inputs.json") -> list[dict]:
@@ -22,48 +27,381 @@ def load_products(file_path: str = "inputs.json") -> list[dict]:
         return json.load(f)
 
 
-def process_products(input_file: str = "inputs.json", output_dir: str = "outputs"):
-    """处理所有产品"""
+def preflight(input_file: str = "inputs.json", concurrency: int = 1) -> list[dict]:
+    """
+    预检整个输入文件，在调用任何 API 之前发现问题
+
+    Returns:
+        规范化、去重后的产品列表
+
+    Raises:
+        PreflightError: 存在结构错误时
+    """
+    plan = plan_batch(load_products(input_file), concurrency=concurrency)
+    print(format_plan(plan))
+    if plan["errors"]:
+        raise PreflightError(f"{input_file} 预检未通过，共 {len(plan['errors'])} 条错误", plan["errors"])
+    return plan["products"]
+
+
+def _initial_state(product: dict, output_dir: str = "outputs") -> AgentState:
+    """构造单个产品的初始状态"""
+    return AgentState(
+        product=product,
+        title="",
+        content="",
+        tags=[],
+        cover_path="",
+        image_prompt="",
+        output_dir=output_dir,
+        cover_fallback=None
+    )
+
+
+def _build_result(product: dict, final_state: AgentState) -> dict:
+    """将最终状态转换为结果记录"""
+    print(f"[完成]")
+    print(f"   产品ID: {product['product_id']}")
+
+    return {
+        "product_id": product["product_id"],
+        "cover": f"{product['product_id']}_cover.png",
+        "title": final_state["title"],
+        "content": final_state["content"],
+        "tags": final_state["tags"]
+    }
+
+
+def _failure_entry(product: dict, stage: str, error: str, state: dict, fallback: bool = False) -> dict:
+    """
+    构造失败清单条目，保留已完成阶段的文案供重试复用
+
+    fallback 为 True 表示产品已有可用的模板封面，只是 AI 封面未生成成功
+    """
+    return {
+        "product_id": product["product_id"],
+        "stage": stage,
+        "error": error,
+        "fallback": fallback,
+        "product": product,
+        "title": state.get("title", ""),
+        "content": state.get("content", ""),
+        "tags": state.get("tags", []),
+        "image_prompt": state.get("image_prompt", ""),
+    }
+
+
+def _handle_failure(product: dict, error: Exception) -> tuple[dict | None, dict]:
+    """
+    记录单个产品的失败
+
+    Returns:
+        (部分结果, 失败清单条目)；文案阶段已完成时部分结果保留文案，cover 为空
+    """
+    stage = getattr(error, "stage", "generate_content")
+    state = getattr(error, "state", None) or {}
+    print(f"[错误] {product['product_id']} 在 {stage} 阶段失败: {str(error)}")
+
+    failure = _failure_entry(product, stage, str(error), state)
+
+    partial = None
+    if stage != "generate_content" and state.get("title"):
+        partial = {
+            "product_id": product["product_id"],
+            "cover": "",
+            "title": state["title"],
+            "content": state.get("content", ""),
+            "tags": state.get("tags", [])
+        }
+    return partial, failure
+
+
+def _finish(product: dict, final_state: AgentState) -> tuple[dict, dict | None]:
+    """
+    生成成功产品的结果
+
+    封面退回模板时同时记录 generate_cover 阶段的失败条目，retry-failed 会重新生成 AI 封面
+    """
+    result = _build_result(product, final_state)
+    reason = final_state.get("cover_fallback")
+    if not reason:
+        return result, None
+    print(f"   ⚠️ {product['product_id']} {reason}，已记入失败清单")
+    return result, _failure_entry(product, "generate_cover", reason, final_state, fallback=True)
+
+
+def _process_product(app, product: dict, state: AgentState | None = None,
+                     output_dir: str = "outputs") -> tuple[dict | None, dict | None]:
+    """用工作流处理单个产品，任何异常都只影响当前产品"""
+    try:
+        final_state = app.invoke(state or _initial_state(product, output_dir))
+    except Exception as e:
+        return _handle_failure(product, e)
+    return _finish(product, final_state)
+
+
+async def aprocess_product(app, product: dict, state: AgentState | None = None,
+                           output_dir: str = "outputs") -> tuple[dict | None, dict | None]:
+    """用异步工作流处理单个产品，返回 (结果, 失败清单条目)"""
+    print(f"\n[处理] 产品: {product['name']} ({product['product_id']})")
+    try:
+        final_state = await app.ainvoke(state or _initial_state(product, output_dir))
+    except Exception as e:
+        return _handle_failure(product, e)
+    return _finish(product, final_state)
+
+
+def _prepare_output(output_dir: str) -> Path:
+    """创建输出目录"""
     output_path = Path(output_dir)
     output_path.mkdir(exist_ok=True)
     (output_path / "covers").mkdir(exist_ok=True)
+    return output_path
+
+
+def _load_json(path: Path, default):
+    """读取 JSON 文件，不存在时返回默认值"""
+    if not path.exists():
+        return default
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_results(output_path: Path, output_dir: str, results: list[dict], failures: list[dict]):
+    """保存所有结果和失败清单"""
+    with open(output_path / "results.json", 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    with open(output_path / FAILURES_FILE, 'w', encoding='utf-8') as f:
+        json.dump(failures, f, ensure_ascii=False, indent=2)
+
+    print(f"\n[完成] 所有产品处理完成! 结果已保存到 {output_dir}/")
+    print(f"   共生成 {len(results)} 个产品的内容")
+    fallbacks = sum(1 for failure in failures if failure.get("fallback"))
+    if fallbacks:
+        print(f"   ⚠️ {fallbacks} 个产品使用了模板封面（AI 封面未生成）")
+    if len(failures) > fallbacks:
+        print(f"   ❌ {len(failures) - fallbacks} 个产品失败")
+    if failures:
+        print(f"   详见 {output_dir}/{FAILURES_FILE}，可运行 python main.py retry-failed 重试")
+
+
+def _collect(outcomes) -> tuple[list[dict], list[dict]]:
+    """拆分 (结果, 失败) 列表"""
+    results = [result for result, _ in outcomes if result is not None]
+    failures = [failure for _, failure in outcomes if failure is not None]
+    return results, failures
+
 
-    products = load_products(input_file)
+def process_products(input_file: str = "inputs.json", output_dir: str = "outputs"):
+    """处理所有产品"""
+    from .core.agent import build_graph
+
+    products = preflight(input_file)
+    output_path = _prepare_output(output_dir)
     app = build_graph()
-    results = []
+    outcomes = []
 
     for product in products:
         print(f"\n[处理] 产品: {product['name']} ({product['product_id']})")
+        outcomes.append(_process_product(app, product, output_dir=output_dir))
 
-        initial_state = AgentState(
-            product=product,
-            title="",
-            content="",
-            tags=[],
-            cover_path="",
-            error=None
-        )
+    _save_results(output_path, output_dir, *_collect(outcomes))
 
-        final_state = app.invoke(initial_state)
 
-        if final_state.get("error"):
-            print(f"[错误] {final_state['error']}")
-            continue
+async def aprocess_products(input_file: str = "inputs.json", output_dir: str = "outputs", concurrency: int = 8):
+    """
+    异步处理所有产品
 
-        result = {
-            "product_id": product["product_id"],
-            "cover": f"{product['product_id']}_cover.png",
-            "title": final_state["title"],
-            "content": final_state["content"],
-            "tags": final_state["tags"]
+    所有产品共用一个事件循环，最多 concurrency 个产品同时处于生成中，结果顺序与输入一致。
+    """
+    import asyncio
+    from .core.agent import build_graph
+    from .services.image_generator import aclose_async_client
+
+    products = preflight(input_file, concurrency=concurrency)
+    output_path = _prepare_output(output_dir)
+    app = build_graph(async_mode=True)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(product: dict):
+        async with semaphore:
+            return await aprocess_product(app, product, output_dir=output_dir)
+
+    try:
+        outcomes = await asyncio.gather(*(run_one(product) for product in products))
+    finally:
+        await aclose_async_client()
+
+    _save_results(output_path, output_dir, *_collect(outcomes))
+
+
+def _check_failure(failure, index: int, stages: tuple[str, ...]) -> list[str]:
+    """校验失败清单条目，返回错误信息列表"""
+    if not isinstance(failure, dict):
+        return [f"第 {index} 项: 应为对象，实际为 {type(failure).__name__}"]
+    label = f"第 {index} 项 ({failure.get('product_id', '?')})"
+    errors = []
+    if not isinstance(failure.get("product_id"), str):
+        errors.append(f"{label}: 缺少 product_id")
+    if failure.get("stage") not in stages:
+        errors.append(f"{label}: 未知阶段 {failure.get('stage')!r}，可选 {', '.join(stages)}")
+    elif failure["stage"] != "generate_content" and not isinstance(failure.get("title"), str):
+        errors.append(f"{label}: 缺少已生成的 title，无法跳过文案阶段")
+    return errors
+
+
+def retry_failed(input_file: str = "inputs.json", output_dir: str = "outputs") -> list[dict] | None:
+    """
+    只重跑失败清单中的产品，并从失败的阶段开始
+
+    已完成阶段的文案直接复用；产品信息优先取输入文件中的最新版本，便于修正数据后重试。
+    结果合并回 results.json，仍失败的产品留在失败清单中。
+
+    Returns:
+        仍失败的条目列表；失败清单或结果文件无法读取、结构有误时返回 None，不修改任何文件
+    """
+    from .core.planner import normalize_product
+    from .core.retry import STAGES
+    from .core.schema import validate_product
+
+    output_path = Path(output_dir)
+    try:
+        failures = _load_json(output_path / FAILURES_FILE, [])
+        results = _load_json(output_path / "results.json", [])
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"[错误] 无法读取 {output_dir}/{FAILURES_FILE} 或 results.json: {str(e)}")
+        return None
+    if not isinstance(failures, list) or not isinstance(results, list):
+        print(f"[错误] {output_dir}/{FAILURES_FILE} 和 results.json 都应为数组")
+        return None
+    if not failures:
+        print(f"[完成] {output_dir}/{FAILURES_FILE} 中没有需要重试的产品")
+        return []
+
+    try:
+        latest = {
+            p["product_id"]: normalize_product(p)
+            for p in load_products(input_file)
+            if isinstance(p, dict) and "product_id" in p
         }
-        results.append(result)
+    except (OSError, json.JSONDecodeError):
+        latest = {}
 
-        print(f"[完成]")
-        print(f"   产品ID: {product['product_id']}")
+    errors = []
+    for index, failure in enumerate(failures):
+        failure_errors = _check_failure(failure, index, STAGES)
+        if not failure_errors:
+            product = latest.get(failure["product_id"], failure.get("product"))
+            failure_errors = validate_product(product, index)
+        errors.extend(failure_errors)
+    if errors:
+        print(f"[错误] {output_dir}/{FAILURES_FILE} 结构有误，共 {len(errors)} 条错误:")
+        for error in errors:
+            print(f"   - {error}")
+        return None
 
-    with open(output_path / "results.json", 'w', encoding='utf-8') as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    from .core.agent import build_graph
 
-    print(f"\n[完成] 所有产品处理完成! 结果已保存到 {output_dir}/")
-    print(f"   共生成 {len(results)} 个产品的内容")
\ No newline at end of file
+    output_path = _prepare_output(output_dir)
+    graphs = {}
+    outcomes = []
+
+    for failure in failures:
+        product = latest.get(failure["product_id"], failure["product"])
+        stage = failure["stage"]
+        if stage not in graphs:
+            graphs[stage] = build_graph(start_at=stage)
+
+        state = _initial_state(product, output_dir)
+        if stage != "generate_content":
+            state.update(title=failure["title"], content=failure.get("content", ""), tags=failure.get("tags", []),
+                         image_prompt=failure.get("image_prompt", ""))
+
+        print(f"\n[重试] 产品: {product['name']} ({product['product_id']})，从 {stage} 阶段开始")
+        outcomes.append(_process_product(graphs[stage], product, state))
+
+    retried, remaining = _collect(outcomes)
+    retried_by_id = {result["product_id"]: result for result in retried}
+    merged = [
+        retried_by_id.pop(result["product_id"], result) if isinstance(result, dict) else result
+        for result in results
+    ]
+    merged.extend(retried_by_id.values())
+
+    _save_results(output_path, output_dir, merged, remaining)
+    return remaining
+
+
+def validate_input(input_file: str = "inputs.json", concurrency: int = 1):
+    """校验输入文件并估算用量，返回 BatchPlan；文件无法读取时返回 None"""
+    try:
+        products = load_products(input_file)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"[错误] 无法读取 {input_file}: {str(e)}")
+        return None
+    plan = plan_batch(products, concurrency=concurrency)
+    print(format_plan(plan))
+    return plan
+
+
+def render_covers(input_file: str = "inputs.json", output_dir: str = "outputs", force: bool = False) -> list[str] | None:
+    """
+    根据已有的 results.json 渲染 Pillow 模板封面，不调用任何 API
+
+    默认只为 cover 为空或封面文件缺失的结果渲染，已有的封面（包括 AI 封面）不会被覆盖；
+    force 为 True 时全部重新渲染。产品信息经过与 run 相同的预检和规范化，结构有误的产品
+    直接跳过；渲染成功的封面写回 results.json 的 cover 字段。
+
+    Returns:
+        生成的封面路径列表；results.json 或输入文件无法读取时返回 None
+    """
+    output_path = Path(output_dir)
+    results_file = output_path / "results.json"
+    try:
+        results = _load_json(results_file, None)
+        products = load_products(input_file)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"[错误] 无法读取结果或输入文件: {str(e)}")
+        return None
+    if results is None:
+        print(f"[错误] 未找到 {results_file}，请先运行 python main.py run")
+        return None
+    if not isinstance(results, list):
+        print(f"[错误] {results_file} 应为结果数组，实际为 {type(results).__name__}")
+        return None
+
+    from .services.cover_generator import generate_cover
+
+    plan = plan_batch(products)
+    for error in plan["errors"]:
+        print(f"[跳过] {error}")
+    products_by_id = {product["product_id"]: product for product in plan["products"]}
+    cover_paths = []
+
+    for result in results:
+        product_id = result.get("product_id") if isinstance(result, dict) else None
+        product = products_by_id.get(product_id)
+        if product is None:
+            print(f"[跳过] {product_id} 不在 {input_file} 的有效产品中")
+            continue
+        if not force and result.get("cover") and (output_path / "covers" / result["cover"]).exists():
+            print(f"[跳过] {product_id} 已有封面 {result['cover']}，使用 --force 重新渲染")
+            continue
+
+        cover_path = generate_cover(
+            product_id=product_id,
+            product_name=product["name"],
+            title=result.get("title") or product["name"],
+            image_prompt="",
+            tone=product["tone"],
+            selling_point=product.get("selling_point", ""),
+            output_dir=str(output_path / "covers")
+        )
+        result["cover"] = f"{product_id}_cover.png"
+        cover_paths.append(cover_path)
+        print(f"[完成] {cover_path}")
+
+    with open(results_file, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    return cover_paths
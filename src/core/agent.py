@@ -4,20 +4,33 @@ Agent 工作流定义
 from langgraph.graph import StateGraph, END
 from langgraph.graph.state import CompiledStateGraph
 
+from .retry import STAGES, get_retry_policy
 from .state import AgentState
-from ..services.content_generator import generate_content_node
-from ..services.cover_generator import generate_cover_node
+from ..services.content_generator import generate_content_node, agenerate_content_node
+from ..services.cover_generator import generate_cover_node, agenerate_cover_node
 
 
-def build_graph() -> CompiledStateGraph:
-    """构建 LangGraph 工作流"""
-    workflow = StateGraph(AgentState)
+def build_graph(async_mode: bool = False, start_at: str = "generate_content") -> CompiledStateGraph:
+    """
+    构建 LangGraph 工作流
+
+    Args:
+        async_mode: 为 True 时使用异步节点，配合 ainvoke 在同一事件循环中并发处理
+        start_at: 起始节点，重试失败产品时可跳过已完成的阶段
+    """
+    nodes = {
+        "generate_content": agenerate_content_node if async_mode else generate_content_node,
+        "generate_cover": agenerate_cover_node if async_mode else generate_cover_node,
+    }
+    stages = STAGES[STAGES.index(start_at):]
 
-    workflow.add_node("generate_content", generate_content_node)
-    workflow.add_node("generate_cover", generate_cover_node)
+    workflow = StateGraph(AgentState)
+    for stage in stages:
+        workflow.add_node(stage, nodes[stage], retry_policy=get_retry_policy(stage))
 
-    workflow.set_entry_point("generate_content")
-    workflow.add_edge("generate_content", "generate_cover")
-    workflow.add_edge("generate_cover", END)
+    workflow.set_entry_point(stages[0])
+    for current, following in zip(stages, stages[1:]):
+        workflow.add_edge(current, following)
+    workflow.add_edge(stages[-1], END)
 
     return workflow.compile()
\ No newline at end of file
@@ -0,0 +1,171 @@
+"""
+批量预检与规划
+在调用任何 API 之前对整个产品目录做一次遍历：规范化字段、校验结构、去重、按语气分组，
+并估算 token 用量、图像任务数和按并发度计算的耗时。只依赖标准库。
+"""
+import math
+import re
+from typing import TypedDict
+
+from .schema import validate_product
+
+TONE_NAMES = ("温馨治愈", "活泼俏皮", "专业测评", "种草安利", "简约高级")
+
+# 估算参数：提示词模板本身的 token 数、模型输出 token 数、各阶段平均耗时（秒）
+CONTENT_PROMPT_TOKENS = 320
+CONTENT_OUTPUT_TOKENS = 700
+COVER_PROMPT_TOKENS = 380
+COVER_OUTPUT_TOKENS = 160
+TITLE_TOKENS = 30
+CONTENT_SECONDS = 12.0
+COVER_PROMPT_SECONDS = 6.0
+IMAGE_SECONDS = 30.0
+
+_CJK_RE = re.compile(r"[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+_FEATURE_SPLIT_RE = re.compile(r"[\n,，、;；]+")
+
+
+class PreflightError(ValueError):
+    """预检未通过，errors 为逐条错误信息"""
+
+    def __init__(self, message: str, errors: list[str] | None = None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+class BatchPlan(TypedDict):
+    """预检结果"""
+    products: list[dict]
+    errors: list[str]
+    warnings: list[str]
+    duplicates: list[str]
+    by_tone: dict[str, list[str]]
+    input_tokens: int
+    output_tokens: int
+    image_tasks: int
+    concurrency: int
+    estimated_seconds: float
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日韩字符约 1 token/字，其余约 4 字符/token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def normalize_product(product: dict) -> dict:
+    """规范化单个产品：去除首尾空白、拆分字符串形式的 features、转换数字字符串形式的价格"""
+    normalized = {
+        key: value.strip() if isinstance(value, str) else value
+        for key, value in product.items()
+    }
+
+    features = normalized.get("features")
+    if isinstance(features, str):
+        normalized["features"] = [f.strip() for f in _FEATURE_SPLIT_RE.split(features) if f.strip()]
+    elif isinstance(features, list):
+        normalized["features"] = [f.strip() if isinstance(f, str) else f for f in features]
+
+    price = normalized.get("price")
+    if isinstance(price, str):
+        try:
+            number = float(price.rstrip("元").strip())
+            normalized["price"] = int(number) if number.is_integer() else number
+        except ValueError:
+            pass
+
+    return normalized
+
+
+def plan_batch(products, concurrency: int = 1) -> BatchPlan:
+    """
+    对整个产品目录做预检
+
+    Args:
+        products: load_products 读取的原始产品列表
+        concurrency: 计划使用的并发产品数，用于估算总耗时
+
+    Returns:
+        BatchPlan，errors 非空时不应开始处理
+    """
+    concurrency = max(1, concurrency)
+    plan = BatchPlan(
+        products=[],
+        errors=[],
+        warnings=[],
+        duplicates=[],
+        by_tone={},
+        input_tokens=0,
+        output_tokens=0,
+        image_tasks=0,
+        concurrency=concurrency,
+        estimated_seconds=0.0,
+    )
+
+    if not isinstance(products, list):
+        plan["errors"].append(f"输入应为产品数组，实际为 {type(products).__name__}")
+        return plan
+
+    seen: dict[str, dict] = {}
+    for index, raw in enumerate(products):
+        product = normalize_product(raw) if isinstance(raw, dict) else raw
+        errors = validate_product(product, index)
+        if errors:
+            plan["errors"].extend(errors)
+            continue
+
+        product_id = product["product_id"]
+        if product_id in seen:
+            if seen[product_id] == product:
+                plan["duplicates"].append(product_id)
+            else:
+                plan["errors"].append(f"第 {index} 项: product_id {product_id} 重复且内容不同")
+            continue
+        seen[product_id] = product
+
+        if product["tone"] not in TONE_NAMES:
+            plan["warnings"].append(f"{product_id}: 未知语气 {product['tone']}，将使用默认风格")
+        plan["by_tone"].setdefault(product["tone"], []).append(product_id)
+        plan["products"].append(product)
+
+    for product in plan["products"]:
+        content_fields = "".join([
+            product["name"], product["category"], str(product["price"]),
+            product["target_audience"], product["selling_point"], product["tone"],
+            *product["features"],
+        ])
+        cover_fields = "".join([
+            product["name"], product["category"], product["selling_point"], product["tone"] * 2,
+        ])
+        plan["input_tokens"] += (
+            CONTENT_PROMPT_TOKENS + estimate_tokens(content_fields)
+            + COVER_PROMPT_TOKENS + estimate_tokens(cover_fields) + TITLE_TOKENS
+        )
+        plan["output_tokens"] += CONTENT_OUTPUT_TOKENS + COVER_OUTPUT_TOKENS
+
+    count = len(plan["products"])
+    plan["image_tasks"] = count
+    per_product = CONTENT_SECONDS + COVER_PROMPT_SECONDS + IMAGE_SECONDS
+    plan["estimated_seconds"] = math.ceil(count / concurrency) * per_product
+
+    return plan
+
+
+def format_plan(plan: BatchPlan) -> str:
+    """格式化预检结果"""
+    lines = [
+        f"[预检] 有效产品 {len(plan['products'])} 个，重复 {len(plan['duplicates'])} 个，错误 {len(plan['errors'])} 条",
+    ]
+    for tone, product_ids in plan["by_tone"].items():
+        lines.append(f"   {tone}: {len(product_ids)} 个")
+    lines.append(f"   预计输入 token: {plan['input_tokens']}，输出 token: {plan['output_tokens']}")
+    lines.append(f"   图像任务: {plan['image_tasks']} 个")
+    minutes = plan["estimated_seconds"] / 60
+    lines.append(f"   并发 {plan['concurrency']} 时预计耗时: {minutes:.1f} 分钟")
+    for warning in plan["warnings"]:
+        lines.append(f"   ⚠️ {warning}")
+    for error in plan["errors"]:
+        lines.append(f"   ❌ {error}")
+    return "\n".join(lines)
@@ -0,0 +1,120 @@
+"""
+节点重试策略
+
+节点失败时抛出 NodeError，携带阶段名和失败时的状态；LangGraph 按每个节点的 RetryPolicy
+决定是否重试。可重试的错误按异常类名匹配原始异常（含父类），因此无需导入各 SDK 的异常类型。
+节点内部的单次网络调用（如图像任务的提交、轮询、下载）用 retry_call / aretry_call 按同样的配置
+就地重试，不必重跑整个节点。
+
+环境变量（阶段专属配置优先，如 MODE_RETRY_GENERATE_COVER_MAX_ATTEMPTS）:
+    MODE_RETRY_MAX_ATTEMPTS      最大尝试次数，默认 3
+    MODE_RETRY_INITIAL_INTERVAL  首次重试前等待秒数，默认 1
+    MODE_RETRY_BACKOFF_FACTOR    退避倍数，默认 2
+    MODE_RETRY_MAX_INTERVAL      最长等待秒数，默认 30
+    MODE_RETRY_ON                逗号分隔的可重试异常类名
+"""
+import os
+import time
+
+STAGES = ("generate_content", "generate_cover")
+
+DEFAULT_RETRY_ON = (
+    "ConnectionError",
+    "TimeoutError",
+    "JSONDecodeError",
+    "RequestException",
+    "TransportError",
+    "APIConnectionError",
+    "RateLimitError",
+    "InternalServerError",
+)
+
+
+class NodeError(Exception):
+    """节点执行失败"""
+
+    def __init__(self, stage: str, message: str, state: dict):
+        super().__init__(message)
+        self.stage = stage
+        self.state = state
+
+
+def is_retryable(exc: BaseException, retry_on: tuple[str, ...] = DEFAULT_RETRY_ON) -> bool:
+    """判断节点异常的原始错误是否属于可重试类型"""
+    cause = exc.__cause__ if isinstance(exc, NodeError) and exc.__cause__ is not None else exc
+    return any(cls.__name__ in retry_on for cls in type(cause).__mro__)
+
+
+def _setting(stage: str, name: str, default: str) -> str:
+    return os.getenv(f"MODE_RETRY_{stage.upper()}_{name}") or os.getenv(f"MODE_RETRY_{name}") or default
+
+
+def get_retry_settings(stage: str) -> dict:
+    """读取环境变量，返回指定阶段的重试配置"""
+    retry_on = tuple(
+        name.strip()
+        for name in _setting(stage, "ON", ",".join(DEFAULT_RETRY_ON)).split(",")
+        if name.strip()
+    )
+    return {
+        "max_attempts": max(1, int(_setting(stage, "MAX_ATTEMPTS", "3"))),
+        "initial_interval": float(_setting(stage, "INITIAL_INTERVAL", "1")),
+        "backoff_factor": float(_setting(stage, "BACKOFF_FACTOR", "2")),
+        "max_interval": float(_setting(stage, "MAX_INTERVAL", "30")),
+        "retry_on": retry_on,
+    }
+
+
+def get_retry_policy(stage: str):
+    """构建指定阶段的 RetryPolicy"""
+    from langgraph.types import RetryPolicy
+
+    settings = get_retry_settings(stage)
+    retry_on = settings.pop("retry_on")
+    return RetryPolicy(**settings, retry_on=lambda exc: is_retryable(exc, retry_on))
+
+
+def _next_delay(settings: dict, attempt: int, error: Exception) -> float | None:
+    """第 attempt 次调用失败后的等待秒数；不可重试或次数用尽时返回 None"""
+    if attempt >= settings["max_attempts"] or not is_retryable(error, settings["retry_on"]):
+        return None
+    delay = min(settings["max_interval"], settings["initial_interval"] * settings["backoff_factor"] ** (attempt - 1))
+    print(f"   ⚠️ {type(error).__name__}: {str(error)}，{delay:.1f} 秒后重试 ({attempt}/{settings['max_attempts'] - 1})")
+    return delay
+
+
+def retry_call(stage: str, func, *args, **kwargs):
+    """
+    调用 func，遇到可重试错误时按阶段的退避配置就地重试
+
+    Raises:
+        最后一次调用的异常（不可重试或次数用尽时）
+    """
+    settings = get_retry_settings(stage)
+    attempt = 1
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            delay = _next_delay(settings, attempt, e)
+            if delay is None:
+                raise
+        time.sleep(delay)
+        attempt += 1
+
+
+async def aretry_call(stage: str, func, *args, **kwargs):
+    """retry_call 的异步版本，func 为协程函数"""
+    import asyncio
+
+    settings = get_retry_settings(stage)
+    attempt = 1
+    while True:
+        try:
+            return await func(*args, **kwargs)
+        except Exception as e:
+            delay = _next_delay(settings, attempt, e)
+            if delay is None:
+                raise
+        await asyncio.sleep(delay)
+        attempt += 1
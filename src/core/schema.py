@@ -0,0 +1,36 @@
+"""
+输入数据结构校验
+只依赖标准库，供 validate 等轻量命令使用
+"""
+
+REQUIRED_FIELDS: dict[str, type | tuple[type, ...]] = {
+    "product_id": str,
+    "name": str,
+    "category": str,
+    "price": (int, float),
+    "target_audience": str,
+    "features": list,
+    "selling_point": str,
+    "tone": str,
+}
+
+
+def validate_product(product, index: int) -> list[str]:
+    """校验单个产品，返回错误信息列表"""
+    if not isinstance(product, dict):
+        return [f"第 {index} 项: 应为对象，实际为 {type(product).__name__}"]
+
+    label = f"第 {index} 项 ({product.get('product_id', '?')})"
+    errors = []
+    for field, expected in REQUIRED_FIELDS.items():
+        if field not in product:
+            errors.append(f"{label}: 缺少字段 {field}")
+        elif isinstance(product[field], bool) or not isinstance(product[field], expected):
+            errors.append(f"{label}: 字段 {field} 类型错误 ({type(product[field]).__name__})")
+
+    features = product.get("features")
+    if isinstance(features, list) and not all(isinstance(f, str) for f in features):
+        errors.append(f"{label}: features 中只能包含字符串")
+
+    return errors
+
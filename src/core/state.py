@@ -11,5 +11,7 @@ class AgentState(TypedDict):
     content: str
     tags: list[str]
     cover_path: str
-    error: str | None
+    image_prompt: str
+    output_dir: str
+    cover_fallback: str | None
 
@@ -0,0 +1,265 @@
+"""
+常驻服务模式
+
+启动后工作流只编译一次，LLM 客户端、图像 API 连接池和字体缓存在进程生命周期内保持常驻。
+通过本地 HTTP/JSON 接口持续提交产品批次，任务在后台事件循环中按全局并发上限执行。
+
+接口:
+    GET  /health          服务状态
+    POST /jobs            提交产品数组（或 {"products": [...]}），返回任务信息
+    GET  /jobs            所有任务摘要
+    GET  /jobs/{job_id}   任务状态与结果
+"""
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from .app import aprocess_product
+from .core.planner import PreflightError, plan_batch
+
+# 内存中最多保留的已完成任务摘要数，更早的任务只能从 jobs/<job_id>.json 读取
+MAX_FINISHED_JOBS = 256
+
+
+class JobQueue:
+    """
+    在后台线程的事件循环中执行任务
+
+    任务完成并写入 jobs/<job_id>.json 后，内存中只保留不含结果的摘要，结果按需从磁盘读取。
+    """
+
+    def __init__(self, output_dir: str = "outputs", concurrency: int = 8):
+        from .core.agent import build_graph
+
+        self.output_path = Path(output_dir)
+        (self.output_path / "jobs").mkdir(parents=True, exist_ok=True)
+        self.concurrency = max(1, concurrency)
+        self.app = build_graph(async_mode=True)
+        self.jobs: dict[str, dict] = {}
+        self._finished: deque[str] = deque()
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._thread = threading.Thread(target=self._loop.run_forever, name="rednote-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, products) -> dict:
+        """
+        预检并提交一批产品
+
+        Raises:
+            PreflightError: 预检未通过时，整批不会入队
+        """
+        plan = plan_batch(products, concurrency=self.concurrency)
+        if plan["errors"]:
+            raise PreflightError(f"预检未通过，共 {len(plan['errors'])} 条错误", plan["errors"])
+
+        job_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self.jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "total": len(plan["products"]),
+                "completed": 0,
+                "failed": [],
+                "fallbacks": [],
+                "duplicates": plan["duplicates"],
+                "results": [],
+                "error": None,
+                "created_at": time.time(),
+                "finished_at": None,
+            }
+        future = asyncio.run_coroutine_threadsafe(self._run(job_id, plan["products"]), self._loop)
+        future.add_done_callback(partial(self._on_job_done, job_id))
+        return self.get(job_id, include_results=False)
+
+    def _on_job_done(self, job_id: str, future) -> None:
+        """任务协程异常退出时记录错误并标记为 error，避免任务永远停留在 running"""
+        if future.cancelled():
+            error = "任务被取消"
+        elif future.exception() is not None:
+            exc = future.exception()
+            error = f"{type(exc).__name__}: {str(exc)}"
+        else:
+            return
+
+        print(f"[错误] 任务 {job_id} 异常终止: {error}")
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job["status"] != "done":
+                job.update(status="error", error=error, finished_at=time.time())
+                self._retire(job_id)
+
+    def _retire(self, job_id: str) -> None:
+        """登记已结束的任务，超出 MAX_FINISHED_JOBS 时淘汰最早的任务摘要，需持有 _lock"""
+        self._finished.append(job_id)
+        while len(self._finished) > MAX_FINISHED_JOBS:
+            self.jobs.pop(self._finished.popleft(), None)
+
+    async def _run_product(self, job_id: str, product: dict) -> None:
+        async with self._semaphore:
+            with self._lock:
+                self.jobs[job_id]["status"] = "running"
+            job_dir = str(self.output_path / "jobs" / job_id)
+            result, failure = await aprocess_product(self.app, product, output_dir=job_dir)
+
+        with self._lock:
+            job = self.jobs[job_id]
+            job["completed"] += 1
+            if result is not None:
+                job["results"].append(result)
+            if failure is not None:
+                entry = {key: failure[key] for key in ("product_id", "stage", "error")}
+                job["fallbacks" if failure.get("fallback") else "failed"].append(entry)
+
+    async def _run(self, job_id: str, products: list[dict]) -> None:
+        await asyncio.gather(*(self._run_product(job_id, product) for product in products))
+
+        finished_at = time.time()
+        with self._lock:
+            job = self.jobs[job_id]
+            snapshot = json.loads(json.dumps(dict(job, status="done", finished_at=finished_at), ensure_ascii=False))
+
+        try:
+            await asyncio.to_thread(self._write_job, job_id, snapshot)
+            saved = True
+        except OSError as e:
+            print(f"[错误] 任务 {job_id} 结果写入失败，结果保留在内存中: {str(e)}")
+            saved = False
+
+        with self._lock:
+            job.update(status="done", finished_at=finished_at)
+            if saved:
+                job.pop("results")
+                self._retire(job_id)
+        print(f"[完成] 任务 {job_id}: 成功 {len(snapshot['results'])} 个（模板封面 {len(snapshot['fallbacks'])} 个），"
+              f"失败 {len(snapshot['failed'])} 个")
+
+    def _job_file(self, job_id: str) -> Path:
+        return self.output_path / "jobs" / f"{job_id}.json"
+
+    def _write_job(self, job_id: str, snapshot: dict) -> None:
+        with open(self._job_file(job_id), 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False, indent=2)
+
+    def _load_job(self, job_id: str) -> dict | None:
+        """从磁盘读取已完成任务的快照"""
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self._job_file(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def get(self, job_id: str, include_results: bool = True) -> dict | None:
+        """返回任务快照，已完成任务的结果从磁盘读取"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            snapshot = None
+            if job is not None:
+                snapshot = dict(job, failed=list(job["failed"]), fallbacks=list(job["fallbacks"]),
+                                results=list(job.get("results", [])))
+                on_disk = "results" not in job
+
+        if snapshot is None or (include_results and on_disk):
+            snapshot = self._load_job(job_id)
+            if snapshot is None:
+                return None
+        if not include_results:
+            snapshot.pop("results", None)
+        return snapshot
+
+    def list(self) -> list[dict]:
+        """返回所有任务摘要"""
+        with self._lock:
+            job_ids = list(self.jobs)
+        return [self.get(job_id, include_results=False) for job_id in job_ids]
+
+    def shutdown(self) -> None:
+        """关闭共享客户端并停止后台事件循环"""
+        from .services.image_generator import aclose_async_client
+
+        asyncio.run_coroutine_threadsafe(aclose_async_client(), self._loop).result(timeout=10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """HTTP/JSON 接口"""
+
+    server: "JobServer"
+
+    def _send_json(self, status: int, payload) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        queue = self.server.queue
+        path = self.path.rstrip("/")
+        if path == "/health":
+            self._send_json(200, {"status": "ok", "jobs": len(queue.jobs), "concurrency": queue.concurrency})
+        elif path == "/jobs":
+            self._send_json(200, queue.list())
+        elif path.startswith("/jobs/"):
+            job = queue.get(path[len("/jobs/"):])
+            if job is None:
+                self._send_json(404, {"error": "任务不存在"})
+            else:
+                self._send_json(200, job)
+        else:
+            self._send_json(404, {"error": "未知路径"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            self._send_json(404, {"error": "未知路径"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"null")
+        except (ValueError, json.JSONDecodeError) as e:
+            self._send_json(400, {"error": f"请求体不是合法 JSON: {str(e)}"})
+            return
+
+        products = payload.get("products") if isinstance(payload, dict) else payload
+        try:
+            job = self.server.queue.submit(products)
+        except PreflightError as e:
+            self._send_json(400, {"error": str(e), "errors": e.errors})
+            return
+        self._send_json(202, job)
+
+
+class JobServer(ThreadingHTTPServer):
+    """持有 JobQueue 的 HTTP 服务"""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], queue: JobQueue):
+        super().__init__(address, JobRequestHandler)
+        self.queue = queue
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000, output_dir: str = "outputs", concurrency: int = 8):
+    """启动常驻服务，Ctrl+C 退出"""
+    queue = JobQueue(output_dir=output_dir, concurrency=concurrency)
+    server = JobServer((host, port), queue)
+    print(f"[服务] 已启动 http://{host}:{port}  (并发 {queue.concurrency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[服务] 正在停止...")
+    finally:
+        server.server_close()
+        queue.shutdown()
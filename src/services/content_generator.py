@@ -5,12 +5,12 @@ import json
 from langchain_core.messages import HumanMessage, SystemMessage
 
 from .llm_client import init_llm_client
+from ..core.retry import NodeError
 from ..core.state import AgentState
 
 
-def generate_content_node(state: AgentState) -> AgentState:
-    """生成文案内容节点"""
-    product = state["product"]
+def build_content_messages(product: dict) -> list:
+    """构建文案生成的提示消息"""
 
     tone_map = {
         "温馨治愈": "温暖、治愈、像朋友般贴心的语气",
@@ -45,28 +45,52 @@ def generate_content_node(state: AgentState) -> AgentState:
 
 请生成小红书笔记内容。"""
 
+    return [
+        SystemMessage(content=system_prompt),
+        HumanMessage(content=user_prompt)
+    ]
+
+
+def apply_content_response(state: AgentState, response) -> AgentState:
+    """解析模型返回的 JSON 并写入状态"""
+    content_text = str(response.content)
+
+    if "```json" in content_text:
+        content_text = content_text.split("```json")[1].split("```")[0].strip()
+    elif "```" in content_text:
+        content_text = content_text.split("```")[1].split("```")[0].strip()
+
+    result = json.loads(content_text)
+
+    state["title"] = result.get("title", "")
+    state["content"] = result.get("content", "")
+    state["tags"] = result.get("tags", [])
+    return state
+
+
+def generate_content_node(state: AgentState) -> AgentState:
+    """生成文案内容节点"""
     try:
+        messages = build_content_messages(state["product"])
         client = init_llm_client()
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=user_prompt)
-        ]
-
         response = client.invoke(messages)
-        content_text = str(response.content)
+        apply_content_response(state, response)
 
-        if "```json" in content_text:
-            content_text = content_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in content_text:
-            content_text = content_text.split("```")[1].split("```")[0].strip()
+    except Exception as e:
+        raise NodeError("generate_content", f"文案生成失败: {str(e)}", dict(state)) from e
+
+    return state
 
-        result = json.loads(content_text)
 
-        state["title"] = result.get("title", "")
-        state["content"] = result.get("content", "")
-        state["tags"] = result.get("tags", [])
+async def agenerate_content_node(state: AgentState) -> AgentState:
+    """生成文案内容节点（异步版本）"""
+    try:
+        messages = build_content_messages(state["product"])
+        client = init_llm_client()
+        response = await client.ainvoke(messages)
+        apply_content_response(state, response)
 
     except Exception as e:
-        state["error"] = f"文案生成失败: {str(e)}"
+        raise NodeError("generate_content", f"文案生成失败: {str(e)}", dict(state)) from e
 
     return state
\ No newline at end of file
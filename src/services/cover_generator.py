@@ -3,19 +3,129 @@
 使用 Pillow 生成小红书风格的封面图
 """
 from PIL import Image, ImageDraw, ImageFont, ImageStat
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
-import textwrap
+import math
+import os
+import re
+import threading
+
+from .font_coverage import glyph_coverage
+from ..core.retry import NodeError
+
+# 候选字体按优先级排列，首个存在的为首选字体，其余作为缺字时的备用字体
+# 只放可缩放的矢量字体，位图字体（如 Apple Color Emoji）只支持固定字号，无法按封面字号加载
+FONT_PATHS = [
+    r"C:\Windows\Fonts\msyh.ttc",
+    r"C:\Windows\Fonts\simhei.ttf",
+    r"C:\Windows\Fonts\simkai.ttf",
+    r"C:\Windows\Fonts\seguiemj.ttf",
+    r"/System/Library/Fonts/STHeiti Medium.ttc",
+    r"/System/Library/Fonts/PingFang.ttc",
+    r"/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    r"/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+]
+
+
+# 同时解码/绘制中的整幅图像数量上限，峰值内存约为该值 × 单幅图像缓冲区
+MAX_INFLIGHT_IMAGES = max(1, int(os.getenv("MODE_IMG_MAX_INFLIGHT", "4")))
+_image_budget = threading.BoundedSemaphore(MAX_INFLIGHT_IMAGES)
+# 异步模式下的 Pillow 任务专用线程池，线程数与图像预算一致，排队的任务不会占满默认线程池
+_image_executor = ThreadPoolExecutor(max_workers=MAX_INFLIGHT_IMAGES, thread_name_prefix="rednote-image")
+
+# 文字区域分析使用的缩略图长边上限
+ANALYSIS_SIZE = 256
+
+
+@lru_cache(maxsize=1)
+def available_font_paths() -> tuple[str, ...]:
+    """返回所有存在的候选字体路径"""
+    return tuple(p for p in FONT_PATHS if os.path.exists(p))
+
+
+@lru_cache(maxsize=32)
+def _truetype(font_path: str, size: int):
+    """按字号加载并缓存字体，长驻进程中每个字体/字号只解析一次；无法加载（文件缺失、不支持该字号）时返回 None"""
+    try:
+        return ImageFont.truetype(font_path, size)
+    except OSError:
+        return None
+
+
+# 无法读取字体覆盖信息时的保守规则：常用中日韩文字、ASCII 可见字符、全角/半角符号
+DEFAULT_TEXT_RANGES = (
+    (0x4E00, 0x9FFF), (0x3400, 0x4DBF), (0x3040, 0x30FF), (0xAC00, 0xD7AF),
+    (0x20, 0x7E), (0xFF01, 0xFF9F),
+)
+
 
+def _strip_pattern(ranges) -> re.Pattern:
+    """编译删除范围外字符的正则，空白字符始终保留"""
+    allowed = "".join(f"\\U{start:08x}-\\U{end:08x}" for start, end in ranges)
+    return re.compile(f"[^{allowed}\\s]+")
+
+
+def _coverage_ranges(coverage: frozenset[int]) -> list[tuple[int, int]]:
+    """把码位集合合并为连续区间"""
+    ranges = []
+    for code in sorted(coverage):
+        if ranges and code == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], code)
+        else:
+            ranges.append((code, code))
+    return ranges
 
-def sanitize_text(text: str) -> str:
+
+_DEFAULT_PATTERN = _strip_pattern(DEFAULT_TEXT_RANGES)
+# 没有可用候选字体时的兜底字体（arial / Pillow 默认字体）只保证 ASCII 可见字符
+_FALLBACK_PATTERN = _strip_pattern(((0x20, 0x7E),))
+
+
+@lru_cache(maxsize=16)
+def _text_pattern(font_path: str | None) -> re.Pattern:
+    """返回字体对应的过滤正则，每个字体只根据 cmap 编译一次；覆盖信息不可用时使用默认规则"""
+    coverage = glyph_coverage(font_path) if font_path else None
+    if coverage is None:
+        return _DEFAULT_PATTERN
+    return _strip_pattern(_coverage_ranges(coverage))
+
+
+def sanitize_text(text: str, font_path: str | None = None) -> str:
+    """删除无法渲染的字符；指定字体时按该字体的字形覆盖过滤"""
     if not text:
         return ""
-    result = []
-    for ch in text:
-        code = ord(ch)
-        if 0x4E00 <= code <= 0x9FFF or 0x3400 <= code <= 0x4DBF or 0x3040 <= code <= 0x30FF or 0xAC00 <= code <= 0xD7AF or 0x20 <= code <= 0x7E or 0xFF01 <= code <= 0xFF60 or 0xFF61 <= code <= 0xFF9F or ch.isspace():
-            result.append(ch)
-    return "".join(result)
+    return _text_pattern(font_path).sub("", text)
+
+
+def prepare_text(text: str, size: int):
+    """
+    为一段文本选择字体并过滤字符
+
+    优先使用第一个能完整覆盖文本且能按该字号加载的候选字体；都无法完整覆盖时使用第一个
+    能加载的候选字体，并删除它无法渲染的字符；候选字体都无法加载时只保留 ASCII 字符，
+    避免出现方框。
+
+    Returns:
+        (字体对象, 处理后的文本)
+    """
+    paths = available_font_paths()
+    if text:
+        needed = {ord(ch) for ch in set(text) if not ch.isspace()}
+        for path in paths:
+            coverage = glyph_coverage(path)
+            if coverage is not None and needed <= coverage:
+                font = _truetype(path, size)
+                if font is not None:
+                    return font, text
+
+    for path in paths:
+        font = _truetype(path, size)
+        if font is not None:
+            return font, sanitize_text(text, path)
+
+    font = _truetype("arial.ttf", size) or ImageFont.load_default(size)
+    return font, _FALLBACK_PATTERN.sub("", text) if text else ""
 
 
 def wrap_text_by_width(draw: ImageDraw.ImageDraw, text: str, font, max_width: int, max_lines: int = 3):
@@ -55,9 +165,21 @@ def wrap_text_by_width(draw: ImageDraw.ImageDraw, text: str, font, max_width: in
     return lines
 
 
+def _analysis_thumbnail(img: Image.Image) -> tuple[Image.Image, int]:
+    """生成用于区域分析的缩小灰度图，返回缩略图和缩小倍数"""
+    factor = max(1, math.ceil(max(img.size) / ANALYSIS_SIZE))
+    source = img if img.mode in ("L", "RGB", "RGBA") else img.convert("RGB")
+    reduced = source.reduce(factor) if factor > 1 else source
+    gray = reduced.convert("L")
+    if reduced is not source:
+        reduced.close()
+    if source is not img:
+        source.close()
+    return gray, factor
+
+
 def find_best_text_region(img: Image.Image, block_width: int, block_height: int, margin: int = 20):
     width, height = img.size
-    gray = img.convert("L")
 
     block_width = min(block_width, width - margin * 2)
     block_height = min(block_height, height - margin * 2)
@@ -74,19 +196,21 @@ def find_best_text_region(img: Image.Image, block_width: int, block_height: int,
     best_score = None
     best_rect = (margin, margin, margin + block_width, margin + block_height)
 
-    for px, py in positions:
-        cx = int(width * px)
-        cy = int(height * py)
-        x0 = max(margin, min(cx - block_width // 2, width - margin - block_width))
-        y0 = max(margin, min(cy - block_height // 2, height - margin - block_height))
-        x1 = x0 + block_width
-        y1 = y0 + block_height
-        crop = gray.crop((x0, y0, x1, y1))
-        stat = ImageStat.Stat(crop)
-        var = stat.var[0]
-        if best_score is None or var < best_score:
-            best_score = var
-            best_rect = (x0, y0, x1, y1)
+    gray, factor = _analysis_thumbnail(img)
+    with gray:
+        for px, py in positions:
+            cx = int(width * px)
+            cy = int(height * py)
+            x0 = max(margin, min(cx - block_width // 2, width - margin - block_width))
+            y0 = max(margin, min(cy - block_height // 2, height - margin - block_height))
+            x1 = x0 + block_width
+            y1 = y0 + block_height
+            box = (x0 // factor, y0 // factor, max(x0 // factor + 1, x1 // factor), max(y0 // factor + 1, y1 // factor))
+            stat = ImageStat.Stat(gray.crop(box))
+            var = stat.var[0]
+            if best_score is None or var < best_score:
+                best_score = var
+                best_rect = (x0, y0, x1, y1)
 
     return best_rect
 
@@ -148,131 +272,90 @@ def generate_cover(
 
     colors = color_schemes.get(tone, color_schemes["温馨治愈"])
 
-    img = Image.new('RGB', (width, height), colors["bg"])
-    draw = ImageDraw.Draw(img)
+    output_path = Path(output_dir) / f"{product_id}_cover.png"
+    with _image_budget, Image.new('RGB', (width, height), colors["bg"]) as img:
+        draw = ImageDraw.Draw(img)
+
+        draw.rectangle([(0, 0), (width, 400)], fill=colors["primary"])
 
-    draw.rectangle([(0, 0), (width, 400)], fill=colors["primary"])
+        draw.rectangle([(0, height-300), (width, height)],
+                       fill=colors["primary"] + (128,))
 
-    draw.rectangle([(0, height-300), (width, height)],
-                   fill=colors["primary"] + (128,))
+        def get_font_height(font_obj):
+            """获取字体高度"""
+            bbox = draw.textbbox((0, 0), "测试", font=font_obj)
+            return bbox[3] - bbox[1]
 
-    try:
-        import os
-        font_paths = [
-            r"C:\Windows\Fonts\msyh.ttc",
-            r"C:\Windows\Fonts\simhei.ttf",
-            r"C:\Windows\Fonts\simkai.ttf",
-            r"/System/Library/Fonts/STHeiti Medium.ttc",
-            r"/System/Library/Fonts/PingFang.ttc",
-        ]
-        font_path = None
-        for p in font_paths:
-            if os.path.exists(p):
-                font_path = p
-                break
-        if font_path:
-            font_large = ImageFont.truetype(font_path, 80)
-            font_medium = ImageFont.truetype(font_path, 60)
-            font_small = ImageFont.truetype(font_path, 40)
-        else:
-            font_large = ImageFont.truetype("arial.ttf", 80)
-            font_medium = ImageFont.truetype("arial.ttf", 60)
-            font_small = ImageFont.truetype("arial.ttf", 40)
-    except:
-        font_large = ImageFont.load_default()
-        font_medium = ImageFont.load_default()
-        font_small = ImageFont.load_default()
-
-    def get_font_height(font_obj):
-        """获取字体高度"""
-        bbox = draw.textbbox((0, 0), "测试", font=font_obj)
-        return bbox[3] - bbox[1]
-
-    layout_seed = sum(ord(c) for c in str(product_id)) % 3
-    margin = 60
-    max_text_width = width - margin * 2
-
-    product_text = sanitize_text(product_name)
-    bbox = draw.textbbox((0, 0), product_text, font=font_medium)
-    text_width = bbox[2] - bbox[0]
-    if layout_seed == 0:
-        text_x = margin
-    elif layout_seed == 1:
-        text_x = width - text_width - margin
-    else:
-        text_x = (width - text_width) // 2
-    draw.text((text_x, 150), product_text, fill="white", font=font_medium)
-
-    title_clean = sanitize_text(title)
-    title_lines = wrap_text_by_width(draw, title_clean, font_large, max_text_width, max_lines=3)
-
-    if layout_seed == 0:
-        y_offset = 520
-    elif layout_seed == 1:
-        y_offset = 580
-    else:
-        y_offset = 640
-
-    line_height = get_font_height(font_large) + 10
-    block_height = line_height * min(3, len(title_lines or []))
-    if block_height > 0 and y_offset + block_height > height - margin:
-        y_offset = height - margin - block_height
-
-    for line in title_lines[:3]:
-        bbox = draw.textbbox((0, 0), line, font=font_large)
+        layout_seed = sum(ord(c) for c in str(product_id)) % 3
+        margin = 60
+        max_text_width = width - margin * 2
+
+        font_medium, product_text = prepare_text(product_name, 60)
+        bbox = draw.textbbox((0, 0), product_text, font=font_medium)
         text_width = bbox[2] - bbox[0]
-        if layout_seed == 1:
+        if layout_seed == 0:
             text_x = margin
-        elif layout_seed == 2:
+        elif layout_seed == 1:
             text_x = width - text_width - margin
         else:
             text_x = (width - text_width) // 2
-        draw.text((text_x, y_offset), line,
-                  fill=colors["text"], font=font_large)
-        y_offset += line_height
-
-    decoration = "✨ 种草推荐 ✨"
-    bbox = draw.textbbox((0, 0), decoration, font=font_small)
-    text_width = bbox[2] - bbox[0]
-    if layout_seed == 0:
-        text_x = margin
-    elif layout_seed == 1:
-        text_x = width - text_width - margin
-    else:
-        text_x = (width - text_width) // 2
-    text_y = height - 150
-    draw.text((text_x, text_y), decoration,
-              fill="white", font=font_small)
+        draw.text((text_x, 150), product_text, fill="white", font=font_medium)
 
-    output_path = Path(output_dir) / f"{product_id}_cover.png"
-    img.save(output_path, "PNG")
-
-    return str(output_path)
+        font_large, title_clean = prepare_text(title, 80)
+        title_lines = wrap_text_by_width(draw, title_clean, font_large, max_text_width, max_lines=3)
 
+        if layout_seed == 0:
+            y_offset = 520
+        elif layout_seed == 1:
+            y_offset = 580
+        else:
+            y_offset = 640
+
+        line_height = get_font_height(font_large) + 10
+        block_height = line_height * min(3, len(title_lines or []))
+        if block_height > 0 and y_offset + block_height > height - margin:
+            y_offset = height - margin - block_height
+
+        for line in title_lines[:3]:
+            bbox = draw.textbbox((0, 0), line, font=font_large)
+            text_width = bbox[2] - bbox[0]
+            if layout_seed == 1:
+                text_x = margin
+            elif layout_seed == 2:
+                text_x = width - text_width - margin
+            else:
+                text_x = (width - text_width) // 2
+            draw.text((text_x, y_offset), line,
+                      fill=colors["text"], font=font_large)
+            y_offset += line_height
 
-def generate_cover_node(state):
-    """生成封面图节点 - 使用 Gemini AI 生成"""
-    from langchain_core.messages import HumanMessage
-    from ..core.state import AgentState
-    from .llm_client import init_llm_client
-    from .image_generator import generate_image_with_api
+        font_small, decoration = prepare_text("✨ 种草推荐 ✨", 40)
+        bbox = draw.textbbox((0, 0), decoration, font=font_small)
+        text_width = bbox[2] - bbox[0]
+        if layout_seed == 0:
+            text_x = margin
+        elif layout_seed == 1:
+            text_x = width - text_width - margin
+        else:
+            text_x = (width - text_width) // 2
+        text_y = height - 150
+        draw.text((text_x, text_y), decoration,
+                  fill="white", font=font_small)
 
-    if state.get("error"):
-        return state
+        img.save(output_path, "PNG")
 
-    product = state["product"]
-    product_id = product["product_id"]
+    return str(output_path)
 
-    try:
-        client = init_llm_client()
 
-        prompt = f"""你是一位专业的AI图像提示词工程师,请为小红书封面生成详细的英文AI图像提示词。
+def build_image_prompt_request(product: dict, title: str) -> str:
+    """构建生成英文图像提示词的请求文本"""
+    return f"""你是一位专业的AI图像提示词工程师,请为小红书封面生成详细的英文AI图像提示词。
 
 产品信息:
 - 产品名称: {product['name']}
 - 产品类别: {product['category']}
 - 核心卖点: {product['selling_point']}
-- 标题文案: {state['title']}
+- 标题文案: {title}
 - 风格调性: {product['tone']}
 
 要求:
@@ -289,151 +372,208 @@ def generate_cover_node(state):
 
 请直接返回英文提示词,不要解释,不要中文。"""
 
-        response = client.invoke([HumanMessage(content=prompt)])
-        image_prompt = str(response.content).strip()
 
-        if image_prompt.startswith("```"):
-            lines = image_prompt.split("\n")
-            image_prompt = "\n".join(
-                [l for l in lines if not l.startswith("```")])
+def clean_image_prompt(response) -> str:
+    """去除模型返回中的代码块标记"""
+    image_prompt = str(response.content).strip()
+
+    if image_prompt.startswith("```"):
+        lines = image_prompt.split("\n")
+        image_prompt = "\n".join(
+            [l for l in lines if not l.startswith("```")])
+
+    return image_prompt.strip()
 
-        image_prompt = image_prompt.strip()
 
-        print(f"\n   🎨 AI提示词生成:")
-        print(f"   {image_prompt}\n")
+def overlay_cover_text(output_path: str, product: dict, title: str) -> None:
+    """在 AI 生成的封面上叠加产品名和标题，失败时保留原图"""
+    product_id = product["product_id"]
+
+    print(f"   📝 正在叠加文字...")
+    try:
+        with _image_budget, Image.open(output_path) as img:
+            img.load()
+            draw = ImageDraw.Draw(img)
+
+            color_schemes = {
+                "温馨治愈": {
+                    "bg": (255, 245, 238),
+                    "primary": (255, 182, 193),
+                    "text": (101, 67, 33)
+                },
+                "活泼俏皮": {
+                    "bg": (255, 250, 205),
+                    "primary": (255, 105, 180),
+                    "text": (255, 69, 0)
+                },
+                "专业测评": {
+                    "bg": (240, 248, 255),
+                    "primary": (70, 130, 180),
+                    "text": (25, 25, 112)
+                },
+                "种草安利": {
+                    "bg": (255, 228, 225),
+                    "primary": (255, 99, 71),
+                    "text": (139, 0, 0)
+                },
+                "简约高级": {
+                    "bg": (250, 250, 250),
+                    "primary": (169, 169, 169),
+                    "text": (47, 79, 79)
+                }
+            }
+            colors = color_schemes.get(product["tone"], color_schemes["温馨治愈"])
+
+            width, height = img.size
+            layout_seed = sum(ord(c) for c in str(product_id)) % 5
+            outer_margin = 36
+
+            font_name, name_text = prepare_text(product.get("name") or "", 50)
+            if name_text:
+                bbox = draw.textbbox((0, 0), name_text, font=font_name)
+                name_width = bbox[2] - bbox[0]
+                if layout_seed in (0, 3):
+                    name_x = outer_margin
+                else:
+                    name_x = width - name_width - outer_margin
+                name_y = int(height * 0.08)
+                draw.text((name_x, name_y), name_text, fill=(255, 255, 255), font=font_name, stroke_width=2, stroke_fill=(0, 0, 0))
+
+            font_medium, title_text = prepare_text(title, 50)
+            if title_text:
+                block_width = int(width * 0.7)
+                block_height = int(height * 0.28)
+                x0, y0, x1, y1 = find_best_text_region(img, block_width, block_height, margin=outer_margin)
+                inner_margin = 12
+                max_text_width = (x1 - x0) - inner_margin * 2
+
+                lines = wrap_text_by_width(draw, title_text, font_medium, max_text_width, max_lines=3)
+                bbox = draw.textbbox((0, 0), "测试", font=font_medium)
+                font_height = bbox[3] - bbox[1]
+                line_height = font_height + 8
+                block_height = line_height * min(3, len(lines))
+                if block_height <= 0:
+                    y_offset = y0 + inner_margin
+                else:
+                    y_offset = y0 + max(inner_margin, ((y1 - y0) - block_height) // 2)
+
+                for line in lines[:3]:
+                    bbox = draw.textbbox((0, 0), line, font=font_medium)
+                    text_width = bbox[2] - bbox[0]
+                    text_x = x0 + inner_margin
+                    draw.text((text_x, y_offset), line, fill=colors["text"], font=font_medium, stroke_width=2, stroke_fill=(255, 255, 255))
+                    y_offset += line_height
+
+            img.save(output_path, "PNG")
+        print(f"   ✅ 文字添加完成!\n")
+
+    except Exception as e:
+        print(f"   ⚠️ 文字添加失败: {str(e)}，使用原图")
+
+
+def _covers_dir(state) -> Path:
+    """当前产品封面的输出目录"""
+    return Path(state.get("output_dir") or "outputs") / "covers"
+
+
+def _render_fallback_cover(state, image_prompt: str) -> str:
+    """AI 生成失败时使用 Pillow 模板生成封面，并在状态中记录兜底原因"""
+    product = state["product"]
+    print(f"   ⚠️ AI生成失败,使用备用方案...\n")
+    state["cover_fallback"] = "AI封面生成失败，已使用模板封面"
+    return generate_cover(
+        product_id=product["product_id"],
+        product_name=product["name"],
+        title=state["title"],
+        image_prompt=image_prompt,
+        tone=product["tone"],
+        selling_point=product.get("selling_point", ""),
+        output_dir=str(_covers_dir(state))
+    )
+
+
+async def run_image_task(func, *args):
+    """在专用图像线程池中执行 Pillow 任务，不占用事件循环的默认线程池"""
+    import asyncio
+
+    return await asyncio.get_running_loop().run_in_executor(_image_executor, partial(func, *args))
+
+
+def generate_cover_node(state):
+    """生成封面图节点 - 使用 Gemini AI 生成"""
+    from langchain_core.messages import HumanMessage
+    from .llm_client import init_llm_client
+    from .image_generator import generate_image_with_api
+
+    product = state["product"]
+    product_id = product["product_id"]
+
+    try:
+        # 提示词已在之前的尝试中生成时直接复用，避免重复调用 LLM
+        image_prompt = state.get("image_prompt")
+        if not image_prompt:
+            client = init_llm_client()
+
+            prompt = build_image_prompt_request(product, state["title"])
+            response = client.invoke([HumanMessage(content=prompt)])
+            image_prompt = clean_image_prompt(response)
+            state["image_prompt"] = image_prompt
 
-        output_path = f"outputs/covers/{product_id}_cover.png"
+            print(f"\n   🎨 AI提示词生成:")
+            print(f"   {image_prompt}\n")
+
+        output_path = str(_covers_dir(state) / f"{product_id}_cover.png")
 
         print(f"   🚀 开始生成AI封面...")
         if generate_image_with_api(image_prompt, output_path, aspect_ratio="3:4"):
             print(f"   ✨ AI封面生成完成!\n")
+            overlay_cover_text(output_path, product, state.get("title", ""))
+            state["cover_path"] = output_path
+        else:
+            state["cover_path"] = _render_fallback_cover(state, image_prompt)
 
-            print(f"   📝 正在叠加文字...")
-            try:
-                from PIL import Image
-                img = Image.open(output_path)
-
-                draw = ImageDraw.Draw(img)
-
-                color_schemes = {
-                    "温馨治愈": {
-                        "bg": (255, 245, 238),
-                        "primary": (255, 182, 193),
-                        "text": (101, 67, 33)
-                    },
-                    "活泼俏皮": {
-                        "bg": (255, 250, 205),
-                        "primary": (255, 105, 180),
-                        "text": (255, 69, 0)
-                    },
-                    "专业测评": {
-                        "bg": (240, 248, 255),
-                        "primary": (70, 130, 180),
-                        "text": (25, 25, 112)
-                    },
-                    "种草安利": {
-                        "bg": (255, 228, 225),
-                        "primary": (255, 99, 71),
-                        "text": (139, 0, 0)
-                    },
-                    "简约高级": {
-                        "bg": (250, 250, 250),
-                        "primary": (169, 169, 169),
-                        "text": (47, 79, 79)
-                    }
-                }
-                colors = color_schemes.get(product["tone"], color_schemes["温馨治愈"])
-
-                try:
-                    import os
-                    font_paths = [
-                        r"C:\Windows\Fonts\msyh.ttc",
-                        r"C:\Windows\Fonts\simhei.ttf",
-                        r"C:\Windows\Fonts\simkai.ttf",
-                        r"/System/Library/Fonts/STHeiti Medium.ttc",
-                        r"/System/Library/Fonts/PingFang.ttc",
-                    ]
-                    font_path = None
-                    for p in font_paths:
-                        if os.path.exists(p):
-                            font_path = p
-                            break
-                    if font_path:
-                        font_medium = ImageFont.truetype(font_path, 50)
-                        font_small = ImageFont.truetype(font_path, 35)
-                    else:
-                        font_medium = ImageFont.truetype("arial.ttf", 50)
-                        font_small = ImageFont.truetype("arial.ttf", 35)
-                except:
-                    font_medium = ImageFont.load_default()
-                    font_small = ImageFont.load_default()
-
-                width, height = img.size
-                layout_seed = sum(ord(c) for c in str(product_id)) % 5
-                outer_margin = 36
-
-                name_text = sanitize_text(product.get("name") or "")
-                if name_text:
-                    bbox = draw.textbbox((0, 0), name_text, font=font_medium)
-                    name_width = bbox[2] - bbox[0]
-                    if layout_seed in (0, 3):
-                        name_x = outer_margin
-                    else:
-                        name_x = width - name_width - outer_margin
-                    name_y = int(height * 0.08)
-                    draw.text((name_x, name_y), name_text, fill=(255, 255, 255), font=font_medium, stroke_width=2, stroke_fill=(0, 0, 0))
-
-                import textwrap
-                title_text = sanitize_text(state.get("title", ""))
-                if title_text:
-                    block_width = int(width * 0.7)
-                    block_height = int(height * 0.28)
-                    x0, y0, x1, y1 = find_best_text_region(img, block_width, block_height, margin=outer_margin)
-                    inner_margin = 12
-                    max_text_width = (x1 - x0) - inner_margin * 2
-
-                    lines = wrap_text_by_width(draw, title_text, font_medium, max_text_width, max_lines=3)
-                    bbox = draw.textbbox((0, 0), "测试", font=font_medium)
-                    font_height = bbox[3] - bbox[1]
-                    line_height = font_height + 8
-                    block_height = line_height * min(3, len(lines))
-                    if block_height <= 0:
-                        y_offset = y0 + inner_margin
-                    else:
-                        y_offset = y0 + max(inner_margin, ((y1 - y0) - block_height) // 2)
-
-                    for line in lines[:3]:
-                        bbox = draw.textbbox((0, 0), line, font=font_medium)
-                        text_width = bbox[2] - bbox[0]
-                        text_x = x0 + inner_margin
-                        draw.text((text_x, y_offset), line, fill=colors["text"], font=font_medium, stroke_width=2, stroke_fill=(255, 255, 255))
-                        y_offset += line_height
-
-                img.save(output_path, "PNG")
-                print(f"   ✅ 文字添加完成!\n")
-
-            except Exception as e:
-                print(f"   ⚠️ 文字添加失败: {str(e)}，使用原图")
+    except Exception as e:
+        print(f"   ❌ 封面生成错误: {str(e)}")
+        raise NodeError("generate_cover", f"封面生成失败: {str(e)}", dict(state)) from e
 
-            state["cover_path"] = output_path
+    return state
+
+
+async def agenerate_cover_node(state):
+    """生成封面图节点（异步版本），Pillow 绘制放到专用图像线程池执行以免阻塞事件循环"""
+    from langchain_core.messages import HumanMessage
+    from .llm_client import init_llm_client
+    from .image_generator import agenerate_image_with_api
+
+    product = state["product"]
+    product_id = product["product_id"]
+
+    try:
+        # 提示词已在之前的尝试中生成时直接复用，避免重复调用 LLM
+        image_prompt = state.get("image_prompt")
+        if not image_prompt:
+            client = init_llm_client()
+
+            prompt = build_image_prompt_request(product, state["title"])
+            response = await client.ainvoke([HumanMessage(content=prompt)])
+            image_prompt = clean_image_prompt(response)
             state["image_prompt"] = image_prompt
+
+            print(f"\n   🎨 AI提示词生成:")
+            print(f"   {image_prompt}\n")
+
+        output_path = str(_covers_dir(state) / f"{product_id}_cover.png")
+
+        print(f"   🚀 开始生成AI封面...")
+        if await agenerate_image_with_api(image_prompt, output_path, aspect_ratio="3:4"):
+            print(f"   ✨ AI封面生成完成!\n")
+            await run_image_task(overlay_cover_text, output_path, product, state.get("title", ""))
+            state["cover_path"] = output_path
         else:
-            print(f"   ⚠️ AI生成失败,使用备用方案...\n")
-            cover_path = generate_cover(
-                product_id=product_id,
-                product_name=product["name"],
-                title=state["title"],
-                image_prompt=image_prompt,
-                tone=product["tone"],
-                selling_point=product.get("selling_point", "")
-            )
-            state["cover_path"] = cover_path
-            state["image_prompt"] = image_prompt
+            state["cover_path"] = await run_image_task(_render_fallback_cover, state, image_prompt)
 
     except Exception as e:
-        import traceback
         print(f"   ❌ 封面生成错误: {str(e)}")
-        traceback.print_exc()
-        state["error"] = f"封面生成失败: {str(e)}"
+        raise NodeError("generate_cover", f"封面生成失败: {str(e)}", dict(state)) from e
 
-    return state
\ No newline at end of file
+    return state
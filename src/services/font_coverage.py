@@ -0,0 +1,112 @@
+"""
+字体字形覆盖索引
+直接读取 TrueType/OpenType（含 .ttc 字体集）的 cmap 表，得到字体可渲染的码位集合。
+每个字体文件只解析一次，之后按集合查询即可判断字符能否渲染，避免封面上出现方框（豆腐块）。
+"""
+import struct
+from functools import lru_cache
+
+# (platform_id, encoding_id) 按优先级排列：Unicode 全平面优先，其次 BMP
+_PREFERRED_ENCODINGS = ((3, 10), (0, 6), (0, 4), (3, 1), (0, 3), (0, 2), (0, 1), (0, 0))
+
+
+def _table_offset(data: bytes, font_offset: int, tag: bytes) -> int | None:
+    """在字体表目录中查找指定表的偏移"""
+    num_tables = struct.unpack_from(">H", data, font_offset + 4)[0]
+    for i in range(num_tables):
+        record = font_offset + 12 + i * 16
+        if data[record:record + 4] == tag:
+            return struct.unpack_from(">I", data, record + 8)[0]
+    return None
+
+
+def _format_4(data: bytes, offset: int) -> set[int]:
+    seg_count = struct.unpack_from(">H", data, offset + 6)[0] // 2
+    end_codes = struct.unpack_from(f">{seg_count}H", data, offset + 14)
+    start_offset = offset + 16 + seg_count * 2
+    start_codes = struct.unpack_from(f">{seg_count}H", data, start_offset)
+    deltas = struct.unpack_from(f">{seg_count}h", data, start_offset + seg_count * 2)
+    range_base = start_offset + seg_count * 4
+    range_offsets = struct.unpack_from(f">{seg_count}H", data, range_base)
+
+    codes = set()
+    for i in range(seg_count):
+        start, end = start_codes[i], end_codes[i]
+        if start == 0xFFFF:
+            continue
+        if range_offsets[i] == 0:
+            codes.update(c for c in range(start, end + 1) if (c + deltas[i]) & 0xFFFF)
+            continue
+        glyph_base = range_base + i * 2 + range_offsets[i]
+        glyphs = struct.unpack_from(f">{end - start + 1}H", data, glyph_base)
+        codes.update(start + j for j, glyph in enumerate(glyphs) if glyph and (glyph + deltas[i]) & 0xFFFF)
+    return codes
+
+
+def _format_12(data: bytes, offset: int) -> set[int]:
+    num_groups = struct.unpack_from(">I", data, offset + 12)[0]
+    codes = set()
+    for i in range(num_groups):
+        start, end, glyph = struct.unpack_from(">III", data, offset + 16 + i * 12)
+        codes.update(range(start + (1 if glyph == 0 else 0), end + 1))
+    return codes
+
+
+def _format_6(data: bytes, offset: int) -> set[int]:
+    first, count = struct.unpack_from(">HH", data, offset + 6)
+    glyphs = struct.unpack_from(f">{count}H", data, offset + 10)
+    return {first + i for i, glyph in enumerate(glyphs) if glyph}
+
+
+def _format_0(data: bytes, offset: int) -> set[int]:
+    return {code for code, glyph in enumerate(data[offset + 6:offset + 262]) if glyph}
+
+
+_PARSERS = {0: _format_0, 4: _format_4, 6: _format_6, 12: _format_12}
+
+
+def read_cmap(data: bytes, font_index: int = 0) -> frozenset[int]:
+    """
+    解析字体数据中的 cmap 表
+
+    Args:
+        data: 字体文件内容
+        font_index: .ttc 字体集中的字体序号
+
+    Returns:
+        字体包含字形的 Unicode 码位集合
+    """
+    font_offset = 0
+    if data[:4] == b"ttcf":
+        num_fonts = struct.unpack_from(">I", data, 8)[0]
+        font_offset = struct.unpack_from(">I", data, 12 + min(font_index, num_fonts - 1) * 4)[0]
+
+    cmap = _table_offset(data, font_offset, b"cmap")
+    if cmap is None:
+        return frozenset()
+
+    num_subtables = struct.unpack_from(">H", data, cmap + 2)[0]
+    subtables = {}
+    for i in range(num_subtables):
+        platform_id, encoding_id, sub_offset = struct.unpack_from(">HHI", data, cmap + 4 + i * 8)
+        subtables.setdefault((platform_id, encoding_id), cmap + sub_offset)
+
+    for key in _PREFERRED_ENCODINGS:
+        offset = subtables.get(key)
+        if offset is None:
+            continue
+        parser = _PARSERS.get(struct.unpack_from(">H", data, offset)[0])
+        if parser is not None:
+            return frozenset(parser(data, offset))
+    return frozenset()
+
+
+@lru_cache(maxsize=16)
+def glyph_coverage(font_path: str, font_index: int = 0) -> frozenset[int] | None:
+    """读取并缓存字体文件的字形覆盖集合，文件不可读或格式无法识别时返回 None"""
+    try:
+        with open(font_path, "rb") as f:
+            coverage = read_cmap(f.read(), font_index)
+    except (OSError, struct.error):
+        return None
+    return coverage or None
@@ -1,134 +1,296 @@
 """
 图像生成模块
 """
+import asyncio
 import os
 import time
+import weakref
 import requests
+import httpx
 from pathlib import Path
 
+from ..core.retry import aretry_call, retry_call
 
-def generate_image_with_api(prompt: str, output_path: str, aspect_ratio: str = "3:4") -> bool:
-    """
-    图像生成 API
+# 提交、轮询、下载的网络错误按该阶段的重试配置就地重试，已提交的任务不会因一次查询超时被丢弃
+RETRY_STAGE = "generate_cover"
 
-    Args:
-        prompt: 图像描述提示词（英文）
-        output_path: 输出路径
-        aspect_ratio: 图片比例，支持 1:1, 3:2, 2:3, 3:4, 4:3, 4:5, 5:4, 9:16, 16:9, 21:9
+POLL_INTERVAL = 2
+MAX_POLL_ATTEMPTS = 60
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
 
-    Returns:
-        是否成功生成图像
-    """
+_session = requests.Session()
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """返回当前事件循环共享的 AsyncClient，同一循环内的所有图像任务复用连接池"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(limits=httpx.Limits(max_connections=100, max_keepalive_connections=20))
+        _async_clients[loop] = client
+    return client
+
+
+async def aclose_async_client() -> None:
+    """关闭当前事件循环的共享 AsyncClient"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _build_request(prompt: str, aspect_ratio: str):
+    """构建提交任务所需的 base_url、请求头和请求体，缺少密钥时返回 None"""
     api_key = os.getenv("MODE_IMG_API_KEY")
     base_url = os.getenv("MODE_IMG_BASE_URL")
 
     if not api_key:
         print("   ❌ 未找到 MODE_IMG_API_KEY 环境变量")
-        return False
+        return None
 
     headers = {
         'Authorization': f'Bearer {api_key}',
         'Content-Type': 'application/json'
     }
 
-    try:
-        payload = {
-            "model": os.getenv("MODE_IMG_MODEL"),
-            "prompt": prompt,
-            "aspect_ratio": aspect_ratio,
-            "response_modalities": ["IMAGE"]
-        }
+    payload = {
+        "model": os.getenv("MODE_IMG_MODEL"),
+        "prompt": prompt,
+        "aspect_ratio": aspect_ratio,
+        "response_modalities": ["IMAGE"]
+    }
 
-        print(f"   📤 提交图像生成任务...")
-        print(f"   📝 提示词: {prompt[:80]}...")
+    return base_url, headers, payload
 
-        response = requests.post(
-            f"{base_url}/v1/tasks/generations",
-            json=payload,
-            headers=headers,
-            timeout=30
-        )
 
-        print(f"   🔍 调试: HTTP状态码 {response.status_code}")
+def _parse_submit_response(status_code: int, text: str, result_json) -> str | None:
+    """解析提交任务的响应，成功时返回 request_id"""
+    print(f"   🔍 调试: HTTP状态码 {status_code}")
 
-        if response.status_code != 200:
-            print(f"   ❌ API请求失败 (HTTP {response.status_code})")
-            print(f"   响应: {response.text[:500]}")
-            return False
+    if status_code != 200:
+        print(f"   ❌ API请求失败 (HTTP {status_code})")
+        print(f"   响应: {text[:500]}")
+        return None
+
+    result = result_json()
+    print(f"   🔍 调试: API响应 = {result}")
 
-        result = response.json()
-        print(f"   🔍 调试: API响应 = {result}")
+    if result.get("code") != "success":
+        print(f"   ❌ API返回错误: {result.get('message', 'unknown error')}")
+        return None
 
-        if result.get("code") != "success":
-            print(f"   ❌ API返回错误: {result.get('message', 'unknown error')}")
+    if "data" not in result or not result["data"]:
+        print(f"   ❌ 响应格式错误,data字段为空")
+        print(f"   完整响应: {result}")
+        return None
+
+    request_id = result["data"].get("request_id", "")
+    if not request_id:
+        print(f"   ❌ 响应中缺少 request_id")
+        print(f"   完整响应: {result}")
+        return None
+
+    print(f"   ✅ 任务已提交 (ID: {request_id})")
+    return request_id
+
+
+def _parse_query_response(attempt: int, status_code: int, result_json):
+    """
+    解析任务查询响应
+
+    Returns:
+        ("pending", None) 继续轮询；("completed", url) 可下载；("failed", None) 终止
+    """
+    if status_code != 200:
+        print(f"   ⚠️ 查询失败 (HTTP {status_code})")
+        return "pending", None
+
+    query_result = result_json()
+
+    if query_result.get("code") != "success":
+        print(f"   ⚠️ 查询错误: {query_result.get('message', 'unknown')}")
+        return "pending", None
+
+    data = query_result.get("data", {})
+    status = data.get("status")
+    progress = data.get("progress", "N/A")
+
+    if attempt % 5 == 0:
+        print(f"   ⏳ 生成中... 状态: {status}, 进度: {progress}")
+
+    if status == "COMPLETED":
+        result_data = data.get("data", {})
+        image_urls = result_data.get("image_urls", [])
+
+        if not image_urls:
+            print(f"   ❌ 未找到生成的图片URL")
+            return "failed", None
+
+        return "completed", image_urls[0]
+
+    elif status == "FAILED":
+        fail_reason = data.get("fail_reason", "未知原因")
+        print(f"   ❌ 任务失败: {fail_reason}")
+        return "failed", None
+
+    return "pending", None
+
+
+def _download_image(image_url: str, output_path: str) -> bool:
+    """分块下载图片到临时文件，完成后再替换目标文件，中断时不会留下半张图片"""
+    part_path = Path(f"{output_path}.part")
+    with _session.get(image_url, timeout=30, stream=True) as img_response:
+        if img_response.status_code != 200:
+            print(f"   ❌ 下载图片失败 (HTTP {img_response.status_code})")
             return False
+        part_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(part_path, 'wb') as f:
+                for chunk in img_response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+        except BaseException:
+            part_path.unlink(missing_ok=True)
+            raise
+    os.replace(part_path, output_path)
+    print(f"   ✅ 图片生成成功: {output_path}")
+    return True
+
 
-        if "data" not in result or not result["data"]:
-            print(f"   ❌ 响应格式错误,data字段为空")
-            print(f"   完整响应: {result}")
+async def _adownload_image(client: httpx.AsyncClient, image_url: str, output_path: str) -> bool:
+    """
+    分块下载图片到文件（异步版本）
+
+    每块只有 DOWNLOAD_CHUNK_SIZE 大小，写入本地文件远快于一次线程切换，因此直接在事件循环中写入。
+    """
+    part_path = Path(f"{output_path}.part")
+    async with client.stream("GET", image_url, timeout=30) as img_response:
+        if img_response.status_code != 200:
+            print(f"   ❌ 下载图片失败 (HTTP {img_response.status_code})")
             return False
+        part_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(part_path, 'wb') as f:
+                async for chunk in img_response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+        except BaseException:
+            part_path.unlink(missing_ok=True)
+            raise
+    os.replace(part_path, output_path)
+    print(f"   ✅ 图片生成成功: {output_path}")
+    return True
+
 
-        request_id = result["data"].get("request_id", "")
+def generate_image_with_api(prompt: str, output_path: str, aspect_ratio: str = "3:4") -> bool:
+    """
+    图像生成 API
+
+    Args:
+        prompt: 图像描述提示词（英文）
+        output_path: 输出路径
+        aspect_ratio: 图片比例，支持 1:1, 3:2, 2:3, 3:4, 4:3, 4:5, 5:4, 9:16, 16:9, 21:9
+
+    Returns:
+        是否成功生成图像；网络错误重试用尽时同样返回 False
+    """
+    request = _build_request(prompt, aspect_ratio)
+    if request is None:
+        return False
+    base_url, headers, payload = request
+
+    try:
+        print(f"   📤 提交图像生成任务...")
+        print(f"   📝 提示词: {prompt[:80]}...")
+
+        response = retry_call(
+            RETRY_STAGE,
+            _session.post,
+            f"{base_url}/v1/tasks/generations",
+            json=payload,
+            headers=headers,
+            timeout=30
+        )
+
+        request_id = _parse_submit_response(response.status_code, response.text, response.json)
         if not request_id:
-            print(f"   ❌ 响应中缺少 request_id")
-            print(f"   完整响应: {result}")
             return False
 
-        print(f"   ✅ 任务已提交 (ID: {request_id})")
-
-        max_attempts = 60
-        for attempt in range(max_attempts):
-            time.sleep(2)
+        for attempt in range(MAX_POLL_ATTEMPTS):
+            time.sleep(POLL_INTERVAL)
 
-            query_response = requests.get(
+            query_response = retry_call(
+                RETRY_STAGE,
+                _session.get,
                 f"{base_url}/v1/tasks/generations/{request_id}",
                 headers=headers,
                 timeout=10
             )
 
-            if query_response.status_code != 200:
-                print(f"   ⚠️ 查询失败 (HTTP {query_response.status_code})")
-                continue
+            status, image_url = _parse_query_response(attempt, query_response.status_code, query_response.json)
+            if status == "failed":
+                return False
+            if status == "completed":
+                print(f"   📥 下载图片...")
+                return retry_call(RETRY_STAGE, _download_image, image_url, output_path)
 
-            query_result = query_response.json()
+        print(f"   ⏰ 超时: {MAX_POLL_ATTEMPTS * POLL_INTERVAL}秒内未完成生成")
+        return False
 
-            if query_result.get("code") != "success":
-                print(f"   ⚠️ 查询错误: {query_result.get('message', 'unknown')}")
-                continue
+    except Exception as e:
+        print(f"   ❌ 异常错误: {type(e).__name__}: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
 
-            data = query_result.get("data", {})
-            status = data.get("status")
-            progress = data.get("progress", "N/A")
 
-            if attempt % 5 == 0:
-                print(f"   ⏳ 生成中... 状态: {status}, 进度: {progress}")
+async def agenerate_image_with_api(prompt: str, output_path: str, aspect_ratio: str = "3:4") -> bool:
+    """
+    图像生成 API（异步版本）
 
-            if status == "COMPLETED":
-                result_data = data.get("data", {})
-                image_urls = result_data.get("image_urls", [])
+    轮询期间不占用线程，适合在同一事件循环中并发处理大量产品。参数与返回值同
+    generate_image_with_api。
+    """
+    request = _build_request(prompt, aspect_ratio)
+    if request is None:
+        return False
+    base_url, headers, payload = request
 
-                if not image_urls:
-                    print(f"   ❌ 未找到生成的图片URL")
-                    return False
+    try:
+        print(f"   📤 提交图像生成任务...")
+        print(f"   📝 提示词: {prompt[:80]}...")
 
-                print(f"   📥 下载图片...")
-                img_response = requests.get(image_urls[0], timeout=30)
-                if img_response.status_code == 200:
-                    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-                    with open(output_path, 'wb') as f:
-                        f.write(img_response.content)
-                    print(f"   ✅ 图片生成成功: {output_path}")
-                    return True
-                else:
-                    print(f"   ❌ 下载图片失败 (HTTP {img_response.status_code})")
-                    return False
-
-            elif status == "FAILED":
-                fail_reason = data.get("fail_reason", "未知原因")
-                print(f"   ❌ 任务失败: {fail_reason}")
+        client = get_async_client()
+        response = await aretry_call(
+            RETRY_STAGE,
+            client.post,
+            f"{base_url}/v1/tasks/generations",
+            json=payload,
+            headers=headers,
+            timeout=30
+        )
+
+        request_id = _parse_submit_response(response.status_code, response.text, response.json)
+        if not request_id:
+            return False
+
+        for attempt in range(MAX_POLL_ATTEMPTS):
+            await asyncio.sleep(POLL_INTERVAL)
+
+            query_response = await aretry_call(
+                RETRY_STAGE,
+                client.get,
+                f"{base_url}/v1/tasks/generations/{request_id}",
+                headers=headers,
+                timeout=10
+            )
+
+            status, image_url = _parse_query_response(attempt, query_response.status_code, query_response.json)
+            if status == "failed":
                 return False
+            if status == "completed":
+                print(f"   📥 下载图片...")
+                return await aretry_call(RETRY_STAGE, _adownload_image, client, image_url, output_path)
 
-        print(f"   ⏰ 超时: {max_attempts * 2}秒内未完成生成")
+        print(f"   ⏰ 超时: {MAX_POLL_ATTEMPTS * POLL_INTERVAL}秒内未完成生成")
         return False
 
     except Exception as e:
@@ -136,4 +298,3 @@ def generate_image_with_api(prompt: str, output_path: str, aspect_ratio: str = "
         import traceback
         traceback.print_exc()
         return False
-
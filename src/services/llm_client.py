@@ -2,6 +2,7 @@
 LLM 客户端配置 - 支持多种云厂商和API模型
 """
 import os
+from functools import lru_cache
 from typing import Optional
 from langchain_openai import ChatOpenAI
 
@@ -21,8 +22,9 @@ def get_provider_config(provider: str = None):
     return configs.get(provider, configs["shengsuanyun"])
 
 
+@lru_cache(maxsize=8)
 def init_llm_client(provider: Optional[str] = None, model: Optional[str] = None) -> ChatOpenAI:
-    """初始化 LLM 客户端"""
+    """初始化 LLM 客户端，同一进程内复用同一实例及其连接池"""
     config = get_provider_config(provider)
     
     api_key = os.getenv(config["api_key_env"])